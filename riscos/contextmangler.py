@@ -26,6 +26,8 @@ These manglers can be used by parts of RISC OS Pyromaniac to give contexts that
 do not follow strictly incrementing values.
 """
 
+import array
+
 try:
     from pyromaniac.config import ConfigurationError
 except ImportError:
@@ -36,12 +38,17 @@ except ImportError:
 # A list of the mangler objects
 manglers = {}
 
+# The bit reversal of every 16 bit value, built when first needed
+_reverse16 = None
+
 
 def register_context_mangler(mangler):
     """
     Register a context mangler, as a decorator.
     """
-    name = mangler.name
+    # Only a name declared on the class itself is used, so subclasses are not
+    # registered under the name of their parent
+    name = mangler.__dict__.get('name', None)
     if not name:
         name = mangler.__name__
         mangler.name = name
@@ -56,7 +63,10 @@ def find_context_mangler(name):
     """
     Find a context mangler, given a name.
     """
-    mangler = manglers.get(name.lower(), None)
+    mangler = manglers.get(name, None)
+    if not mangler:
+        # Configured names are usually already lower case, so only fold case if needed
+        mangler = manglers.get(name.lower(), None)
     if not mangler:
         raise ValueError("Context mangler '{}' is not known".format(name))
     return mangler
@@ -77,6 +87,18 @@ def list_context_manglers():
     return sorted(manglers.values(), key=lambda mangler: mangler.name)
 
 
+def _reverse16_table():
+    """
+    Return the table of 16 bit reversed values, indexed by the value to reverse.
+    """
+    global _reverse16
+    if _reverse16 is None:
+        reverse8 = [int('{:08b}'.format(value)[::-1], 2) for value in range(256)]
+        _reverse16 = array.array('H', [(reverse8[value & 0xFF] << 8) | reverse8[value >> 8]
+                                       for value in range(65536)])
+    return _reverse16
+
+
 def ContextManglerName(value):
     """
     Validate a ContextManglerName.
@@ -103,15 +125,20 @@ class ContextManglerBase(object):
     # Description of the parameters to these objects
     params = []
 
+    # The offset is held in a slot; subclasses with parameters keep them in the
+    # instance dictionary, so that they can default to the class attributes
+    __slots__ = ('offset',)
+
+    # Contexts which always map to the same offsets, regardless of the mangler
+    _sentinel_offsets = {0: 0, -1: -1, 0xFFFFFFFF: -1}
+
     def __init__(self, context, *args):
-        if context == 0:
-            self.offset = 0
-        elif context in (-1, 0xFFFFFFFF):
-            self.offset = -1
-        else:
-            if context < 0:
-                context = context + (1<<32)
-            self.offset = self.unmangle(context)
+        offset = self._sentinel_offsets.get(context)
+        if offset is not None:
+            self.offset = offset
+            return
+        # Contexts are 32 bit, but may have been supplied as signed values
+        self.offset = self.unmangle(context & 0xFFFFFFFF)
 
     def __repr__(self):
         opaque = self.opaque
@@ -130,9 +157,10 @@ class ContextManglerBase(object):
 
     @property
     def opaque(self):
-        if self.offset in (0, -1):
-            return self.offset
-        return self.mangle(self.offset)
+        offset = self.offset
+        if offset == 0 or offset == -1:
+            return offset
+        return self.mangle(offset)
 
     def mangle(self, offset):
         """
@@ -146,12 +174,36 @@ class ContextManglerBase(object):
         """
         raise NotImplementedError("{}.unmangle is not implemented".format(self.__class__.__name__))
 
+    def mangle_many(self, offsets):
+        """
+        Turn a sequence of offsets into a list of opaque values.
+        """
+        return list(map(self.mangle, offsets))
+
+    def unmangle_many(self, contexts):
+        """
+        Turn a sequence of opaque values into a list of offsets.
+        """
+        return list(map(self.unmangle, contexts))
+
 
 @register_context_mangler
 class ContextManglerIdentity(ContextManglerBase):
     """
     The number seen externally is the same as the offset - an identity transform.
     """
+    __slots__ = ()
+
+    def __init__(self, context, *args):
+        # The context is the offset, so there is no need to unmangle it
+        offset = self._sentinel_offsets.get(context)
+        if offset is None:
+            offset = context & 0xFFFFFFFF
+        self.offset = offset
+
+    @property
+    def opaque(self):
+        return self.offset
 
     def mangle(self, offset):
         return offset
@@ -159,6 +211,12 @@ class ContextManglerIdentity(ContextManglerBase):
     def unmangle(self, context):
         return context
 
+    def mangle_many(self, offsets):
+        return list(offsets)
+
+    def unmangle_many(self, contexts):
+        return list(contexts)
+
 
 @register_context_mangler
 class ContextManglerBiased(ContextManglerBase):
@@ -174,13 +232,25 @@ class ContextManglerBiased(ContextManglerBase):
             args = args[1:]
         super(ContextManglerBiased, self).__init__(context, args)
 
+    @property
+    def opaque(self):
+        offset = self.offset
+        if offset == 0 or offset == -1:
+            return offset
+        return offset + self.base
+
     def mangle(self, offset):
         return offset + self.base
 
+    def mangle_many(self, offsets):
+        base = self.base
+        return [offset + base for offset in offsets]
+
     def unmangle(self, context):
-        if context > 0 and context < self.base:
+        base = self.base
+        if 0 < context < base:
             raise ValueError("Invalid context value {} for biased mangler".format(context))
-        return context - self.base
+        return context - base
 
 
 @register_context_mangler
@@ -198,9 +268,20 @@ class ContextManglerEOR(ContextManglerBase):
             args = args[1:]
         super(ContextManglerEOR, self).__init__(context, args)
 
+    @property
+    def opaque(self):
+        offset = self.offset
+        if offset == 0 or offset == -1:
+            return offset
+        return 1 + (offset ^ self.eor)
+
     def mangle(self, offset):
         return 1 + (offset ^ self.eor)
 
+    def mangle_many(self, offsets):
+        eor = self.eor
+        return [1 + (offset ^ eor) for offset in offsets]
+
     def unmangle(self, context):
         return (context - 1) ^ self.eor
 
@@ -218,17 +299,53 @@ class ContextManglerReverse(ContextManglerBase):
         if args:
             self.nbits = int(args[0])
             args = args[1:]
+        if self.nbits < 1 or self.nbits > 32:
+            raise ValueError("Invalid number of bits {} for reverse mangler".format(self.nbits))
+        # The bits which are reversed
+        self._mask = (1 << self.nbits) - 1
+        # Up to 16 bits can be reversed by lookup, otherwise the reversal is performed
+        # on 32 bits; either way we shift down to leave just nbits
+        if self.nbits <= 16:
+            self._table = _reverse16_table()
+            self._shift = 16 - self.nbits
+        else:
+            self._table = None
+            self._shift = 32 - self.nbits
+        # The last offset mangled, and its reversed bits, for repeated reads and
+        # stepping sequentially
+        self._last_offset = None
+        self._last_rev = 0
         super(ContextManglerReverse, self).__init__(context, args)
 
     def mangle(self, offset):
-        value = 0
-        for n in range(self.nbits):
-            value = value << 1
-            if offset & 1:
-                value |= 1
-            offset = offset >> 1
-        value = value | (offset << self.nbits)
-        return value
+        mask = self._mask
+        if offset == self._last_offset:
+            # Reading the same offset again (eg the opaque value more than once)
+            return self._last_rev | (offset & ~mask)
+        if self._last_offset is not None and offset == self._last_offset + 1:
+            # Incrementing flips a run of low bits (0...01...1); reversed, that is
+            # the same run at the top of the reversed bits.
+            flipped = (self._last_offset ^ offset).bit_length()
+            if flipped <= self.nbits:
+                low = self._last_rev ^ mask ^ (mask >> flipped)
+                self._last_offset = offset
+                self._last_rev = low
+                return low | (offset & ~mask)
+
+        if self._table is not None:
+            low = self._table[offset & 0xFFFF] >> self._shift
+        else:
+            # Reverse the bottom 32 bits by swapping progressively larger groups of bits
+            x = offset & 0xFFFFFFFF
+            x = ((x >> 1) & 0x55555555) | ((x & 0x55555555) << 1)
+            x = ((x >> 2) & 0x33333333) | ((x & 0x33333333) << 2)
+            x = ((x >> 4) & 0x0F0F0F0F) | ((x & 0x0F0F0F0F) << 4)
+            x = ((x >> 8) & 0x00FF00FF) | ((x & 0x00FF00FF) << 8)
+            x = (x >> 16) | ((x & 0xFFFF) << 16)
+            low = x >> self._shift
+        self._last_offset = offset
+        self._last_rev = low
+        return low | (offset & ~mask)
 
     def unmangle(self, context):
         # This is the same in both directions
@@ -250,18 +367,24 @@ class ContextManglerDescending(ContextManglerBase):
             args = args[1:]
         super(ContextManglerDescending, self).__init__(context, args)
 
+    @property
+    def opaque(self):
+        offset = self.offset
+        if offset == 0 or offset == -1:
+            return offset
+        limit = self.limit
+        high, low = divmod(offset, limit)
+        return high * limit + (limit - low) + 1
+
     def mangle(self, offset):
-        low = offset % self.limit
-        high = int(offset / self.limit) * self.limit
-        low = self.limit - low
-        return low + high + 1
+        limit = self.limit
+        high, low = divmod(offset, limit)
+        return high * limit + (limit - low) + 1
 
     def unmangle(self, context):
-        context = context - 1
-        low = context % self.limit
-        high = int(context / self.limit) * self.limit
-        low = self.limit - low
-        return low + high
+        limit = self.limit
+        high, low = divmod(context - 1, limit)
+        return high * limit + (limit - low)
 
 
 @register_context_mangler
@@ -283,14 +406,41 @@ class ContextManglerMultiplier(ContextManglerBase):
         if args:
             self.bias = int(args[0])
             args = args[1:]
+        if self.multiplier < 1:
+            raise ValueError("Invalid multiplier {} for multiplier mangler".format(self.multiplier))
+        # Power of two multipliers can be converted back with a shift and mask
+        if not (self.multiplier & (self.multiplier - 1)):
+            self._shift = self.multiplier.bit_length() - 1
+            self._mask = self.multiplier - 1
+        else:
+            self._shift = None
+            self._mask = None
         super(ContextManglerMultiplier, self).__init__(context, args)
 
+    @property
+    def opaque(self):
+        offset = self.offset
+        if offset == 0 or offset == -1:
+            return offset
+        return self.bias + offset * self.multiplier
+
     def mangle(self, offset):
         return self.bias + offset * self.multiplier
 
+    def mangle_many(self, offsets):
+        bias = self.bias
+        multiplier = self.multiplier
+        return [bias + offset * multiplier for offset in offsets]
+
     def unmangle(self, context):
         context -= self.bias
-        if context < 0 or context % self.multiplier != 0:
+        if self._shift is not None:
+            if context < 0 or context & self._mask:
+                raise ValueError("Invalid context value {} for multiplier mangler".format(context))
+            return context >> self._shift
+
+        offset, remainder = divmod(context, self.multiplier)
+        if offset < 0 or remainder:
             # This is an invalid context, so we return the terminal context.
             raise ValueError("Invalid context value {} for multiplier mangler".format(context))
-        return int(context / self.multiplier)
+        return offset
@@ -19,11 +19,131 @@ def test():
         for step in range(8):
             offset = context.offset
             assert(offset == step)
+            if offset != 0:
+                # The opaque property may compute the value itself, so must agree with mangle
+                assert(context.opaque == context.mangle(offset))
             print("  Step %i: opaque=%i (&%x) => offset=%i" % (step, context.opaque, context.opaque, offset))
             newcontext = mangler(context.opaque)
             assert(newcontext.offset == context.offset)
             context += 1
 
 
+def test_sentinels():
+    for mangler in contextmangler.list_context_manglers():
+        assert(mangler(0).offset == 0)
+        assert(mangler(-1).offset == -1)
+        assert(mangler(0xFFFFFFFF).offset == -1)
+
+        # Contexts with the top bit set may be supplied as signed values
+        for offset in (0x80000005, 0x80100000, 0x5555555):
+            opaque = mangler(0).mangle(offset)
+            if 0x80000000 <= opaque < (1<<32):
+                break
+        else:
+            assert False, "No offset gives a context with the top bit set for {}".format(mangler.name)
+        assert(mangler(opaque).offset == offset)
+        assert(mangler(opaque - (1<<32)).offset == offset)
+
+
+def test_many():
+    for mangler in contextmangler.list_context_manglers():
+        context = mangler(0)
+        offsets = list(range(1, 100))
+        opaques = context.mangle_many(offsets)
+        assert(opaques == [context.mangle(offset) for offset in offsets])
+        assert(context.unmangle_many(opaques) == offsets)
+
+
+def test_multiplier():
+    for multiplier in (1, 16, 24):
+        mangler = contextmangler.ContextManglerMultiplier(0, multiplier)
+        for offset in list(range(1, 100)) + [(1<<60) + 1]:
+            assert(mangler.unmangle(mangler.mangle(offset)) == offset)
+        try:
+            mangler.unmangle(mangler.mangle(1) + 1)
+            assert(multiplier == 1)
+        except ValueError:
+            assert(multiplier != 1)
+
+
+def test_descending():
+    mangler = contextmangler.ContextManglerDescending(0, 1000)
+    # Values beyond the precision of a float must still be exact
+    for offset in list(range(1, 100)) + [(1<<60) + 1, (1<<60) + 999]:
+        assert(mangler.unmangle(mangler.mangle(offset)) == offset)
+
+
+def test_subclass():
+    # Parameters overridden in a subclass are used as its defaults
+    class ContextManglerReverse8(contextmangler.ContextManglerReverse):
+        __slots__ = ()
+        nbits = 8
+
+    class ContextManglerMultiplier16(contextmangler.ContextManglerMultiplier):
+        __slots__ = ()
+        multiplier = 16
+
+    assert(contextmangler.ContextManglerReverse.nbits == 17)
+    context = ContextManglerReverse8(0)
+    context += 1
+    assert(context.opaque == 128)
+    assert(ContextManglerReverse8(128).offset == 1)
+    assert(ContextManglerReverse8(0, 4).mangle(1) == 8)
+
+    context = ContextManglerMultiplier16(0)
+    context += 2
+    assert(context.opaque == contextmangler.ContextManglerMultiplier.bias + 32)
+    assert(ContextManglerMultiplier16(context.opaque).offset == 2)
+
+
+def test_parameters():
+    # The parameters given at construction are visible on the instance
+    assert(contextmangler.ContextManglerBiased(0, 100).base == 100)
+    assert(contextmangler.ContextManglerEOR(0, 100).eor == 100)
+    assert(contextmangler.ContextManglerReverse(0, 8).nbits == 8)
+    assert(contextmangler.ContextManglerDescending(0, 100).limit == 100)
+    context = contextmangler.ContextManglerMultiplier(0, 16, 0x1000)
+    assert(context.multiplier == 16)
+    assert(context.bias == 0x1000)
+
+    # Without parameters the instance reports the class defaults
+    context = contextmangler.ContextManglerBiased(0)
+    assert(context.base == contextmangler.ContextManglerBiased.base)
+    context.base = 5
+    context += 1
+    assert(context.opaque == 6)
+
+
+def test_reverse():
+    # Check the reversal against a simple bit-by-bit implementation
+    for nbits in (1, 5, 16, 17, 32):
+        for offset in list(range(300)) + [0x12345678, 0x7FFFFFFF, (1<<nbits) - 1]:
+            expected = 0
+            value = offset
+            for n in range(nbits):
+                expected = (expected << 1) | (value & 1)
+                value = value >> 1
+            expected = expected | (value << nbits)
+            mangler = contextmangler.ContextManglerReverse(0, nbits)
+            assert(mangler.mangle(offset) == expected)
+            # A repeated conversion is remembered, so must give the same result
+            assert(mangler.mangle(offset) == expected)
+            assert(mangler.unmangle(expected) == offset)
+
+    # Sequential offsets take a different path to arbitrary offsets
+    for nbits in (1, 5, 17):
+        mangler = contextmangler.ContextManglerReverse(0, nbits)
+        sequential = [mangler.mangle(offset) for offset in range(200)]
+        for offset in range(200):
+            assert(contextmangler.ContextManglerReverse(0, nbits).mangle(offset) == sequential[offset])
+
+
 if __name__ == '__main__':
     test()
+    test_sentinels()
+    test_many()
+    test_multiplier()
+    test_descending()
+    test_subclass()
+    test_parameters()
+    test_reverse()